@@ -1,26 +1,164 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import databento as db
-from datetime import datetime, timedelta, date
+import hashlib
+import io
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, date, timezone
+from pathlib import Path
 
 # -----------------------------------------------------------------------------
 # Helper Function: Split a date range into smaller (start, end) chunks
 # -----------------------------------------------------------------------------
+@st.cache_data
 def chunk_date_range(start_date, end_date, chunk_size_days=7):
     """
     Splits the date range [start_date, end_date] into (start, end) tuples,
     each covering up to chunk_size_days.
     """
-    chunks = []
-    current_start = start_date
-    while current_start < end_date:
-        next_end = current_start + timedelta(days=chunk_size_days)
-        if next_end > end_date:
-            next_end = end_date
-        chunks.append((current_start, next_end))
-        current_start = next_end + timedelta(days=1)
-    return chunks
+    # Chunk starts step by chunk_size_days + 1 and stay before end_date;
+    # each end is chunk_size_days later, capped at end_date
+    end = pd.Timestamp(end_date)
+    starts = pd.date_range(start_date, end - pd.Timedelta(days=1), freq=f"{chunk_size_days + 1}D")
+    ends = starts + pd.Timedelta(days=chunk_size_days)
+    ends = ends.where(ends <= end, end)
+    return list(zip(starts.date, ends.date))
+
+# -----------------------------------------------------------------------------
+# Helper Function: One shared Databento client per API key
+# -----------------------------------------------------------------------------
+@st.cache_resource
+def get_client(api_key):
+    """
+    Returns a db.Historical client, built once per API key and shared by reruns
+    and fetch threads.
+    """
+    return db.Historical(api_key)
+
+# -----------------------------------------------------------------------------
+# Fetch Settings
+# -----------------------------------------------------------------------------
+# Records decoded per batch when streaming a fetched chunk
+BATCH_RECORDS = 1_000_000
+# Chunk downloads in flight at once
+MAX_FETCH_WORKERS = 8
+# Where fetched chunks are stored between runs, next to this file whatever the
+# working directory; never pruned
+CACHE_DIR = Path(__file__).resolve().parent / "cache"
+
+# -----------------------------------------------------------------------------
+# Helper Function: Download one (start, end) chunk of MBO records
+# -----------------------------------------------------------------------------
+def fetch_chunk(client, api_key, symbol, c_start, c_end):
+    """
+    Returns a DBNStore holding the MBO records for symbol in [c_start, c_end).
+    Chunks are kept under CACHE_DIR as .dbn.zst files, so reruns over the same
+    range read from disk instead of downloading again. Cached files are per API
+    key (named by a hash of it), so one key's downloads are never served to
+    another. Chunks reaching today (UTC) may still be incomplete and are always
+    downloaded fresh. CACHE_DIR is never pruned; delete it to reclaim space.
+    Only does I/O, so several chunks can be fetched from worker threads.
+    """
+    request = dict(
+        dataset="GLBX.MDP3",
+        symbols=[symbol],
+        schema="mbo",
+        start=str(c_start),
+        end=str(c_end),
+    )
+    if c_end >= datetime.now(timezone.utc).date():
+        return client.timeseries.get_range(**request)
+
+    safe_symbol = "".join(c if c.isalnum() else "_" for c in str(symbol))
+    key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:12]
+    path = CACHE_DIR / f"{key_hash}_GLBX.MDP3_{safe_symbol}_mbo_{c_start}_{c_end}.dbn.zst"
+    if not path.exists():
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Download to a unique temp name and rename when complete, so failed or
+        # concurrent fetches never collide or leave a partial file at `path`.
+        # get_range() creates the file itself and refuses existing paths.
+        fd, tmp_name = tempfile.mkstemp(dir=CACHE_DIR, prefix=path.name + ".", suffix=".part")
+        os.close(fd)
+        os.unlink(tmp_name)
+        try:
+            client.timeseries.get_range(**request, path=tmp_name)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+    return db.DBNStore.from_file(path)
+
+# -----------------------------------------------------------------------------
+# Side/Action Codes used by DailyAggregator
+# -----------------------------------------------------------------------------
+SIDES = ("none", "bid", "ask")
+ACTIONS = ("none", "add", "cancel", "modify", "trade", "fill", "clearbook")
+# Databento MBO records spell the same values as single characters
+DBN_SIDES = ("N", "B", "A")
+DBN_ACTIONS = ("N", "A", "C", "M", "T", "F", "R")
+
+BID, ASK = SIDES.index("bid"), SIDES.index("ask")
+CLEARBOOK = ACTIONS.index("clearbook")
+# Volume sign per action code: Add/Modify grow the book, Cancel/Trade/Fill shrink it
+ACTION_SIGN = np.array([0.0, 1.0, -1.0, 1.0, -1.0, -1.0, 0.0])
+# Same signs laid out per (side_code, action_code) for each book, so an event's
+# effect on a side is one lookup at side_code * len(ACTIONS) + action_code
+BID_SIGN = np.zeros((len(SIDES), len(ACTIONS)))
+BID_SIGN[BID] = ACTION_SIGN
+ASK_SIGN = np.zeros((len(SIDES), len(ACTIONS)))
+ASK_SIGN[ASK] = ACTION_SIGN
+# (side_code, action_code) pairs that change either book's volume
+MOVES_VOLUME = (BID_SIGN != 0) | (ASK_SIGN != 0)
+
+
+def dbn_code_table(chars):
+    """
+    256-entry lookup from a DBN ASCII code byte to its index in chars (0 if unknown).
+    """
+    table = np.zeros(256, dtype=np.int8)
+    for code, char in enumerate(chars):
+        table[ord(char)] = code
+    return table
+
+
+DBN_SIDE_CODES = dbn_code_table(DBN_SIDES)
+DBN_ACTION_CODES = dbn_code_table(DBN_ACTIONS)
+
+
+def dbn_events(records):
+    """
+    Builds the event columns DailyAggregator.update() needs from a batch of raw
+    MBO records (structured array from DBNStore.to_ndarray()), without going
+    through a full DataFrame of every record field.
+    """
+    raw_price = records["price"]
+    return pd.DataFrame({
+        # ts_event is uint64 nanoseconds since the epoch
+        "date": records["ts_event"].view("datetime64[ns]").astype("datetime64[D]"),
+        "side_code": DBN_SIDE_CODES[records["side"].view(np.uint8)],
+        "action_code": DBN_ACTION_CODES[records["action"].view(np.uint8)],
+        "size": records["size"],
+        "price": np.where(raw_price == db.UNDEF_PRICE, np.nan, raw_price / db.FIXED_PRICE_SCALE),
+    })
+
+
+def to_codes(values, categories, ignore_case=False):
+    """
+    Maps each label in `values` to its index in `categories` (0 if unknown).
+    Labels are dictionary-encoded first, so matching runs once per distinct label.
+    """
+    values = pd.Series(values, dtype="category")
+    labels = values.cat.categories
+    if ignore_case:
+        labels = labels.astype(str).str.lower()
+    # Trailing -1 is picked up by the -1 code of missing values
+    lookup = np.append(pd.Index(categories).get_indexer(labels), -1)
+    codes = lookup[values.cat.codes.to_numpy()]
+    return np.where(codes < 0, 0, codes).astype(np.int8)
 
 # -----------------------------------------------------------------------------
 # Per-Day Aggregator for Bid/Ask Volumes
@@ -28,82 +166,224 @@ def chunk_date_range(start_date, end_date, chunk_size_days=7):
 class DailyAggregator:
     """
     Stores rolling bid_volume, ask_volume, last_price for each date.
+    Each field is one NumPy array; row i holds day first_day + i.
     Example usage:
         aggregator = DailyAggregator()
-        aggregator.update(dateobj, side, size, action, price)
+        aggregator.update(events_df)
         final_df = aggregator.to_dataframe()
     """
     def __init__(self):
-        # { date_obj: { 'bid_volume': float, 'ask_volume': float, 'price': float } }
-        self.daily_data = {}
-
-    def _ensure_date(self, dateobj):
-        if dateobj not in self.daily_data:
-            self.daily_data[dateobj] = {
-                "bid_volume": 0.0,
-                "ask_volume": 0.0,
-                "price": None  # last observed price
-            }
+        self.first_day = None  # numpy datetime64[D] of row 0
+        self.bid_volume = np.zeros(0)
+        self.ask_volume = np.zeros(0)
+        self.price = np.zeros(0)  # last observed price, NaN if none
+        self.seen = np.zeros(0, dtype=bool)  # day had at least one event
 
-    def update(self, dateobj, side, size, action, price):
+    def _ensure_days(self, first, last):
+        """
+        Grow the per-day arrays so they cover every day in [first, last].
         """
-        Update volumes & price based on an event record.
-        side: 'Bid' or 'Ask'
-        action: Add, Cancel, Modify, Trade, Fill, clearBook, etc.
+        if self.first_day is not None:
+            first = min(first, self.first_day)
+            last = max(last, self.first_day + len(self.seen) - 1)
+            if first == self.first_day and last == self.first_day + len(self.seen) - 1:
+                return
+        n_days = int((last - first).astype(np.int64)) + 1
+        offset = 0 if self.first_day is None else int((self.first_day - first).astype(np.int64))
+        for name, fill in (("bid_volume", 0.0), ("ask_volume", 0.0), ("price", np.nan), ("seen", False)):
+            old = getattr(self, name)
+            grown = np.full(n_days, fill, dtype=old.dtype)
+            grown[offset:offset + len(old)] = old
+            setattr(self, name, grown)
+        self.first_day = first
+
+    def update(self, events):
+        """
+        Update volumes & prices from a DataFrame of event records, in row order.
+        date: day the event belongs to
+        side_code: index into SIDES
+        action_code: index into ACTIONS
         size: numeric
-        price: numeric (the most recent price)
+        price: numeric (last non-null price per day is kept)
+
+        Add/Modify grow a side's volume, Cancel/Trade/Fill shrink it (never
+        below zero) and clearBook resets both sides.
         """
-        self._ensure_date(dateobj)
-        day_info = self.daily_data[dateobj]
-
-        # Always update last price if we have a valid price
-        if price is not None:
-            day_info["price"] = float(price)
-
-        side = side.lower() if side else "none"
-        action = action.lower() if action else "none"
-        size = float(size or 0.0)
-
-        if action == "add":
-            if side == "bid":
-                day_info["bid_volume"] += size
-            elif side == "ask":
-                day_info["ask_volume"] += size
-
-        elif action in ("cancel", "trade", "fill"):
-            # Decrease volume from the side
-            if side == "bid":
-                day_info["bid_volume"] = max(0.0, day_info["bid_volume"] - size)
-            elif side == "ask":
-                day_info["ask_volume"] = max(0.0, day_info["ask_volume"] - size)
-
-        elif action == "modify":
-            # Naive approach: treat as "add" of new size. Real logic needs old size or IDs.
-            if side == "bid":
-                day_info["bid_volume"] += size
-            elif side == "ask":
-                day_info["ask_volume"] += size
-
-        elif action == "clearbook":
-            day_info["bid_volume"] = 0.0
-            day_info["ask_volume"] = 0.0
-        # action == "none" => do nothing
+        events = events.reindex(columns=["date", "side_code", "size", "action_code", "price"])
+        dates = pd.to_datetime(events["date"]).to_numpy(dtype="datetime64[D]")
+        valid = ~np.isnat(dates)
+        if not valid.any():
+            return
+        events = events[valid]
+        dates = dates[valid]
+
+        self._ensure_days(dates.min(), dates.max())
+        n_days = len(self.seen)
+        day_idx = (dates - self.first_day).astype(np.int64)
+
+        # Bring each day's events together, keeping their original order
+        order = np.argsort(day_idx, kind="stable")
+        day_idx = day_idx[order]
+        side = events["side_code"].fillna(0).to_numpy(dtype=np.int8)[order]
+        action = events["action_code"].fillna(0).to_numpy(dtype=np.int8)[order]
+        size = events["size"].fillna(0.0).to_numpy(dtype=np.float64)[order]
+        price = events["price"].to_numpy(dtype=np.float64)[order]
+        pos = np.arange(len(day_idx))
+        day_start = np.flatnonzero(np.diff(day_idx, prepend=-1))
+
+        has_price = ~np.isnan(price)
+        last_priced = np.full(n_days, -1)
+        np.maximum.at(last_priced, day_idx[has_price], pos[has_price])
+        priced = last_priced >= 0
+        self.price[priced] = price[last_priced[priced]]
+        self.seen[day_idx[day_start]] = True
+
+        # Only events after a day's last clearBook matter for its final volumes.
+        # clearBook is rare, so only batches that contain one pay for the masking.
+        cleared = np.zeros(n_days, dtype=bool)
+        clear_pos = np.flatnonzero(action == CLEARBOOK)
+        if len(clear_pos):
+            last_clear = np.full(n_days, -1)
+            np.maximum.at(last_clear, day_idx[clear_pos], clear_pos)
+            cleared = last_clear >= 0
+            # Events up to the last clearBook look up as action "none" (sign 0)
+            action = np.where(pos > last_clear[day_idx], action, 0)
+        sign_key = side.astype(np.intp) * len(ACTIONS) + action
+
+        # Unknown sides, "none" actions, zero sizes and events wiped by a
+        # clearBook can't move either book; drop them before the per-day scans
+        moves = np.take(MOVES_VOLUME, sign_key) & (size != 0)
+        day_idx, sign_key, size = day_idx[moves], sign_key[moves], size[moves]
+        day_start = np.flatnonzero(np.diff(day_idx, prepend=-1))
+
+        # Volumes are clamped at zero after every event. For a run of deltas the
+        # clamped result is max(start + net, net - min(0, lowest running sum)),
+        # so only those two per-day numbers are needed.
+        for sign_table, volume in ((BID_SIGN, self.bid_volume), (ASK_SIGN, self.ask_volume)):
+            delta = np.take(sign_table, sign_key)
+            delta *= size
+            running = np.cumsum(delta)
+            day_base = np.zeros(n_days)
+            day_base[day_idx[day_start]] = running[day_start] - delta[day_start]
+            floor = np.zeros(n_days)
+            np.minimum.at(floor, day_idx, running - day_base[day_idx])
+            net = np.bincount(day_idx, weights=delta, minlength=n_days)
+            volume[:] = np.maximum(np.where(cleared, 0.0, volume + net), net - floor)
 
     def to_dataframe(self):
         """
         Returns a DataFrame with columns: date, bid_volume, ask_volume, price
         """
-        rows = []
-        for day, info in self.daily_data.items():
-            rows.append({
-                "date": day,
-                "bid_volume": info["bid_volume"],
-                "ask_volume": info["ask_volume"],
-                "price": info["price"],
-            })
-        df = pd.DataFrame(rows)
-        df.sort_values("date", inplace=True)
-        return df
+        rows = np.flatnonzero(self.seen)
+        return pd.DataFrame({
+            "date": self.first_day + rows if len(rows) else np.array([], dtype="datetime64[D]"),
+            "bid_volume": self.bid_volume[rows],
+            "ask_volume": self.ask_volume[rows],
+            "price": self.price[rows],
+        })
+
+# -----------------------------------------------------------------------------
+# Helper Function: Show a bounded preview of a DataFrame
+# -----------------------------------------------------------------------------
+# Rows sent to the browser per table, and points per scatter plot
+PREVIEW_ROWS = 500
+MAX_SCATTER_POINTS = 10_000
+
+
+def show_dataframe(df, max_rows=PREVIEW_ROWS):
+    """
+    Renders at most max_rows of df, with the total row count underneath.
+    """
+    st.dataframe(df.head(max_rows))
+    st.caption(f"{len(df):,} rows total")
+
+# -----------------------------------------------------------------------------
+# Cached Pipeline Steps (memoized on their inputs across Streamlit reruns)
+# -----------------------------------------------------------------------------
+@st.cache_data
+def aggregate_csv(csv_bytes):
+    """
+    Parses an uploaded CSV of events and aggregates it per day.
+    Returns (first rows of the raw CSV, daily DataFrame), where the daily
+    DataFrame is None if the CSV has no 'ts_event' column.
+    """
+    # side/action hold a handful of distinct labels; keep them dictionary-encoded
+    input_data = pd.read_csv(io.BytesIO(csv_bytes), dtype={"side": "category", "action": "category"})
+    preview = input_data.head()
+    if "ts_event" not in input_data.columns:
+        return preview, None
+
+    input_data["ts_event"] = pd.to_datetime(input_data["ts_event"], errors="coerce")
+    # Day key as fixed-width datetime64[D] (same wall-clock day as .dt.date,
+    # without a Python date object per row)
+    ts_event = input_data["ts_event"]
+    if ts_event.dt.tz is not None:
+        ts_event = ts_event.dt.tz_localize(None)
+    input_data["date"] = ts_event.to_numpy().astype("datetime64[D]")
+    input_data.sort_values("ts_event", inplace=True)
+    if "side" in input_data.columns:
+        input_data["side_code"] = to_codes(input_data["side"], SIDES, ignore_case=True)
+    if "action" in input_data.columns:
+        input_data["action_code"] = to_codes(input_data["action"], ACTIONS, ignore_case=True)
+
+    aggregator = DailyAggregator()
+    aggregator.update(input_data)
+    return preview, aggregator.to_dataframe()
+
+
+@st.cache_data
+def add_signals(daily_df):
+    """
+    Returns a copy of daily_df with imbalance and price_change columns added.
+    """
+    # Day-over-day % change written straight into one preallocated array
+    price = daily_df["price"].to_numpy(dtype=np.float64)
+    price_change = np.empty_like(price)
+    price_change[:1] = np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(price[1:], price[:-1], out=price_change[1:])
+    price_change[1:] -= 1.0
+
+    # (bid - ask) / (bid + ask), NaN on days with no volume on either side
+    bid = daily_df["bid_volume"].to_numpy(dtype=np.float64)
+    ask = daily_df["ask_volume"].to_numpy(dtype=np.float64)
+    total = bid + ask
+    imbalance = np.full_like(total, np.nan)
+    np.divide(bid - ask, total, out=imbalance, where=total != 0.0)
+
+    return daily_df.assign(imbalance=imbalance, price_change=price_change)
+
+
+@st.cache_data
+def imbalance_correlation(daily_df):
+    """
+    Pearson correlation of imbalance vs. price_change over days that have both,
+    or None if fewer than two such days.
+    """
+    valid_rows = daily_df.dropna(subset=["imbalance", "price_change"])
+    if len(valid_rows) < 2:
+        return None
+    imbalance = valid_rows["imbalance"].to_numpy(dtype=np.float64)
+    price_change = valid_rows["price_change"].to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return float(np.corrcoef(imbalance, price_change)[0, 1])
+
+
+@st.cache_data
+def build_scatter(daily_df):
+    """
+    Imbalance vs. price change scatter plot for a daily DataFrame.
+    Large frames are downsampled to MAX_SCATTER_POINTS to keep the plot responsive.
+    """
+    if len(daily_df) > MAX_SCATTER_POINTS:
+        daily_df = daily_df.sample(MAX_SCATTER_POINTS, random_state=0)
+    return px.scatter(
+        daily_df,
+        x="imbalance",
+        y="price_change",
+        title="Imbalance vs. Next-Day Price Change",
+        labels={"imbalance": "Order Book Imbalance", "price_change": "Next‐Day % Change"}
+    )
 
 # -----------------------------------------------------------------------------
 # Streamlit App
@@ -144,40 +424,21 @@ final_df = None  # Will store final daily EOD data
 # -----------------------------------------------------------------------------
 if uploaded_file:
     try:
-        input_data = pd.read_csv(uploaded_file)
+        csv_preview, final_df = aggregate_csv(uploaded_file.getvalue())
         data_uploaded = True
         st.write("CSV Data Loaded (raw):")
-        st.dataframe(input_data.head())
+        st.dataframe(csv_preview)
     except Exception as e:
         st.error(f"Error reading CSV file: {e}")
 
-    # Process CSV data in aggregator if we have 'ts_event'
+    # Daily aggregates need 'ts_event' to assign events to days
     if data_uploaded:
-        if "ts_event" in input_data.columns:
-            input_data["ts_event"] = pd.to_datetime(input_data["ts_event"], errors="coerce")
-            input_data["date"] = input_data["ts_event"].dt.date
-            input_data.sort_values("ts_event", inplace=True)
-        else:
+        if final_df is None:
             st.error("CSV missing 'ts_event' column, can't process events.")
-
-        aggregator = DailyAggregator()
-        for idx, row in input_data.iterrows():
-            d = row.get("date")
-            side = row.get("side", "None")
-            size = row.get("size", 0)
-            action = row.get("action", "None")
-            price = row.get("price", None)
-            aggregator.update(d, side, size, action, price)
-
-        final_df = aggregator.to_dataframe()
-        # Compute imbalance + price_change
-        final_df["imbalance"] = (
-            (final_df["bid_volume"] - final_df["ask_volume"]) /
-            (final_df["bid_volume"] + final_df["ask_volume"]).replace(0, pd.NA)
-        )
-        final_df["price_change"] = final_df["price"].astype(float).pct_change()
-        st.write("Daily Aggregated Data from CSV:")
-        st.dataframe(final_df)
+        else:
+            final_df = add_signals(final_df)
+            st.write("Daily Aggregated Data from CSV:")
+            show_dataframe(final_df)
 
 # -----------------------------------------------------------------------------
 # 2) Otherwise, fetch from Databento in chunks (with DBN encoding)
@@ -187,7 +448,7 @@ if fetch_data and api_key and not data_uploaded:
         st.write("Fetching data from Databento with DBN encoding in chunked mode...")
 
         # Attempt symbology resolution (optional)
-        client = db.Historical(api_key)
+        client = get_client(api_key)
         resolved_symbol = symbol_input
         try:
             res = client.symbology.resolve(
@@ -212,56 +473,45 @@ if fetch_data and api_key and not data_uploaded:
         chunk_progress = st.progress(0)
         total_chunks = len(date_chunks)
 
-        for i, (c_start, c_end) in enumerate(date_chunks):
-            st.write(f"Chunk {i+1}/{total_chunks}: {c_start} -> {c_end}")
-
-            # IMPORTANT: Here we specify encoding="dbn" to speed up retrieval
-            chunk_iter = client.timeseries.get_range(
-                dataset="GLBX.MDP3",
-                symbols=[resolved_symbol],
-                schema="mbo",
-                start=str(c_start),
-                end=str(c_end),
-                encoding="dbn"  # only works on older Databento clients (<1.0)
-            )
-            chunk_list = list(chunk_iter)
-            st.write(f"  -> Fetched {len(chunk_list)} records in this chunk.")
-
-            # Process each record on the fly
-            for rec in chunk_list:
-                action = getattr(rec, "action", None)
-                side = getattr(rec, "side", None)
-                size = getattr(rec, "size", 0)
-                price = getattr(rec, "price", None)
-                ts_event = getattr(rec, "ts_event", None)
-
-                if ts_event is not None:
-                    dt = pd.to_datetime(ts_event, unit="ns", errors="coerce")
-                    d = dt.date()
-                else:
-                    d = None
-
-                if d is not None:
-                    aggregator.update(d, side, size, action, price)
-
-            # Discard chunk_list
-            chunk_list = None
-
-            # Update progress
-            chunk_progress.progress((i + 1) / total_chunks)
+        # Downloads overlap in worker threads; decoding and all Streamlit calls
+        # stay on this thread. Chunks cover disjoint days, so completion order
+        # doesn't affect the result.
+        with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, total_chunks)) as pool:
+            futures = {
+                pool.submit(fetch_chunk, client, api_key, resolved_symbol, c_start, c_end): (c_start, c_end)
+                for c_start, c_end in date_chunks
+            }
+            # Leaving the `with` block waits for every download, so on failure drop
+            # the queued ones before re-raising instead of fetching them for nothing.
+            try:
+                for i, future in enumerate(as_completed(futures)):
+                    c_start, c_end = futures[future]
+                    store = future.result()
+                    st.write(f"Chunk {i+1}/{total_chunks}: {c_start} -> {c_end}")
+
+                    # Decode the chunk in fixed-size batches of raw records so only one
+                    # batch is in memory at a time; the aggregator carries each day's
+                    # state across batches.
+                    n_records = 0
+                    for records in store.to_ndarray(count=BATCH_RECORDS):
+                        aggregator.update(dbn_events(records))
+                        n_records += len(records)
+                    st.write(f"  -> Fetched {n_records} records in this chunk.")
+
+                    # Discard chunk data
+                    store = None
+
+                    # Update progress
+                    chunk_progress.progress((i + 1) / total_chunks)
+            except BaseException:
+                pool.shutdown(cancel_futures=True)
+                raise
 
         # Once all chunks are processed, build final daily data
-        final_df = aggregator.to_dataframe()
+        final_df = add_signals(aggregator.to_dataframe())
         data_uploaded = True
         st.write("All chunks processed. Daily Aggregated Data:")
-
-        # Compute imbalance + price_change
-        final_df["imbalance"] = (
-            (final_df["bid_volume"] - final_df["ask_volume"]) /
-            (final_df["bid_volume"] + final_df["ask_volume"]).replace(0, pd.NA)
-        )
-        final_df["price_change"] = final_df["price"].astype(float).pct_change()
-        st.dataframe(final_df)
+        show_dataframe(final_df)
 
     except Exception as e:
         st.error(f"Error fetching data: {e}")
@@ -271,18 +521,11 @@ if fetch_data and api_key and not data_uploaded:
 # -----------------------------------------------------------------------------
 if final_df is not None and data_uploaded:
     st.header("Visualization")
-    fig = px.scatter(
-        final_df,
-        x="imbalance",
-        y="price_change",
-        title="Imbalance vs. Next-Day Price Change",
-        labels={"imbalance": "Order Book Imbalance", "price_change": "Next‐Day % Change"}
-    )
+    fig = build_scatter(final_df)
     st.plotly_chart(fig)
 
-    valid_rows = final_df.dropna(subset=["imbalance", "price_change"])
-    if len(valid_rows) > 1:
-        corr_val = valid_rows[["imbalance", "price_change"]].corr().iloc[0, 1]
+    corr_val = imbalance_correlation(final_df)
+    if corr_val is not None:
         st.write(f"Correlation (Imbalance vs. Price Change): {corr_val:.2f}")
     else:
         st.write("Insufficient data for correlation.")